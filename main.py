@@ -1,65 +1,83 @@
 import argparse
+import functools
+import io
 import math
+import mmap
 import struct
-from PIL import Image, ImageTk
+from PIL import Image
 import sys
 import os
-import tkinter as tk
-from tkinter import ttk
 
-# Try to import matplotlib
-try:
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+# Gray level to character for image_to_ascii, 32 levels per character
+_ASCII_CHARS = ' .:-=+*#%@'  # From dark to light
+_ASCII_TABLE = bytes(ord(_ASCII_CHARS[pixel >> 5]) for pixel in range(256))
 
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
+# Precompiled unpacker for SOF0 header fields
+_SOF_HDR = struct.Struct('>BHH')
 
 
 def parse_jpeg_headers(file_path):
     """Parse JPEG file headers and return a dictionary of markers."""
-    headers = {}
     with open(file_path, 'rb') as f:
-        # Check SOI
-        soi = f.read(2)
-        if soi != b'\xff\xd8':
-            raise ValueError("Not a valid JPEG file")
-        headers['SOI'] = {'value': '0xFFD8', 'description': 'Start of Image'}
-
-        while True:
-            marker = f.read(2)
-            if not marker or marker[0] != 0xFF:
-                break
-            marker_type = marker[1]
-            if marker_type == 0xD9:  # EOI
-                headers['EOI'] = {'value': '0xFFD9',
-                                  'description': 'End of Image'}
-                break
-            length = struct.unpack('>H', f.read(2))[0]
-            data = f.read(length - 2)
-
-            # Interpret common markers
-            if marker_type == 0xE0:  # APP0
-                headers['APP0'] = {'value': f'0xFFE0, length={length}',
-                                   'description': 'JFIF Application Segment',
-                                   'data': data}
-            elif marker_type == 0xC0:  # SOF0
-                precision, height, width = struct.unpack('>BHH', data[:5])
-                headers['SOF0'] = {'value': f'0xFFC0, length={length}',
-                                   'description': 'Start of Frame (Baseline DCT)',
-                                   'precision': precision, 'height': height,
-                                   'width': width}
-            elif marker_type == 0xC4:  # DHT
-                headers['DHT'] = {'value': f'0xFFC4, length={length}',
-                                  'description': 'Define Huffman Table'}
-            elif marker_type == 0xDA:  # SOS
-                headers['SOS'] = {'value': f'0xFFDA, length={length}',
-                                  'description': 'Start of Scan'}
-            else:
-                headers[f'Marker 0xFF{marker_type:02X}'] = {
-                    'value': f'0xFF{marker_type:02X}, length={length}',
-                    'description': 'Unknown or other marker'}
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and pipes can't be mapped, read them in one go
+            return _parse_markers(f.read())
+
+    with mm:
+        return _parse_markers(mm)
+
+
+def _parse_markers(buf):
+    """Parse JPEG markers from an in-memory buffer."""
+    headers = {}
+    # Check SOI
+    if buf[:2] != b'\xff\xd8':
+        raise ValueError("Not a valid JPEG file")
+    headers['SOI'] = {'value': '0xFFD8', 'description': 'Start of Image'}
+
+    pos = 2
+    while pos + 1 < len(buf) and buf[pos] == 0xFF:
+        marker_type = buf[pos + 1]
+        if marker_type == 0xFF:  # Fill bytes may precede a marker
+            pos += 1
+            continue
+        pos += 2
+        if marker_type == 0xD9:  # EOI
+            headers['EOI'] = {'value': '0xFFD9',
+                              'description': 'End of Image'}
+            break
+        if pos + 1 >= len(buf):  # Truncated before the segment length
+            break
+        length = (buf[pos] << 8) | buf[pos + 1]
+
+        # Interpret common markers, payloads are only touched if needed
+        if marker_type == 0xE0:  # APP0
+            # Only the first 50 bytes shown by print_headers are kept
+            preview = buf[pos + 2:pos + 2 + min(length - 2, 50)]
+            headers['APP0'] = {'value': f'0xFFE0, length={length}',
+                               'description': 'JFIF Application Segment',
+                               'data_preview': preview}
+        elif marker_type == 0xC0:  # SOF0
+            precision, height, width = _SOF_HDR.unpack_from(buf, pos + 2)
+            headers['SOF0'] = {'value': f'0xFFC0, length={length}',
+                               'description': 'Start of Frame (Baseline DCT)',
+                               'precision': precision, 'height': height,
+                               'width': width}
+        elif marker_type == 0xC4:  # DHT
+            headers['DHT'] = {'value': f'0xFFC4, length={length}',
+                              'description': 'Define Huffman Table'}
+        elif marker_type == 0xDA:  # SOS
+            headers['SOS'] = {'value': f'0xFFDA, length={length}',
+                              'description': 'Start of Scan'}
+            break  # Entropy-coded data follows, no more headers
+        else:
+            headers[f'Marker 0xFF{marker_type:02X}'] = {
+                'value': f'0xFF{marker_type:02X}, length={length}',
+                'description': 'Unknown or other marker'}
+
+        pos += length
 
     return headers
 
@@ -76,13 +94,41 @@ def print_headers(headers):
             print(f"  Height: {info['height']} pixels")
         if 'width' in info:
             print(f"  Width: {info['width']} pixels")
-        if 'data' in info:
-            print(f"  Data: {info['data'][:50]}...")  # Show first 50 bytes
+        if 'data_preview' in info:
+            print(f"  Data: {info['data_preview']}...")  # First 50 bytes
+
+
+@functools.lru_cache(maxsize=8)
+def _gamma_table(ascii_chars):
+    """Build the gray level to character table for image_to_ascii_detail.
+
+    Returns bytes for single-byte charsets and str otherwise.
+    """
+    last_index = len(ascii_chars) - 1
+
+    # There are only 256 gray levels, so gamma is computed once per level
+    lut = []
+    for pixel in range(256):
+        # Какой-то корректор гаммы, сложнааа: x ** 1.5 == x * sqrt(x)
+        level = pixel / 255.0
+        gamma_corrected = level * math.sqrt(level)
+        char_index = int(gamma_corrected * last_index)
+        lut.append(ascii_chars[max(0, min(last_index, char_index))])
+    lut = ''.join(lut)
+
+    try:
+        return lut.encode('ascii')
+    except UnicodeEncodeError:
+        return lut
 
 
 def image_to_ascii(image_path, max_width=80, max_height=24):
     """Convert image to ASCII art."""
-    img = Image.open(image_path).convert('L')  # Grayscale
+    img = Image.open(image_path)
+    # Let the JPEG decoder downscale while decoding, we only need a few chars
+    img.draft('L', (max_width * 4, max_height * 8))
+    if img.mode != 'L':
+        img = img.convert('L')  # Grayscale, convert('L') on L would copy
     width, height = img.size
 
     # Scale to fit terminal
@@ -99,21 +145,20 @@ def image_to_ascii(image_path, max_width=80, max_height=24):
 
     img = img.resize((new_width, new_height))
 
-    pixels = list(img.getdata())
-    ascii_chars = ' .:-=+*#%@'  # From dark to light
-
-    ascii_image = []
-    for i in range(new_height):
-        row = ''.join(ascii_chars[pixel // 32] for pixel in
-                      pixels[i * new_width:(i + 1) * new_width])
-        ascii_image.append(row)
+    # Map the whole image in one pass, then split it into rows
+    text = img.tobytes().translate(_ASCII_TABLE).decode('ascii')
+    ascii_image = [text[i * new_width:(i + 1) * new_width]
+                   for i in range(new_height)]
 
     return '\n'.join(ascii_image)
 
 
 def image_to_ascii_detail(image_path, max_width=80, max_height=24,
                           charset=1):
-    img = Image.open(image_path).convert('L')
+    img = Image.open(image_path)
+    img.draft('L', (max_width * 4, max_height * 8))
+    if img.mode != 'L':
+        img = img.convert('L')
     width, height = img.size
 
     # Scaling calculation
@@ -125,8 +170,18 @@ def image_to_ascii_detail(image_path, max_width=80, max_height=24,
         scale_height = max_height
         scale_width = int(scale_height * aspect_ratio)
 
-    # High-quality resampling
-    img = img.resize((scale_width, scale_height), Image.LANCZOS)
+    # Clamp to 1 so a zero target size is left for resize() to reject
+    ratio = max(width / max(scale_width, 1), height / max(scale_height, 1))
+
+    # High-quality resampling only where it can still show, output is
+    # quantized to a handful of characters anyway
+    if ratio > 16:
+        resample = Image.BILINEAR
+    elif ratio > 4:
+        resample = Image.BICUBIC
+    else:
+        resample = Image.LANCZOS
+    img = img.resize((scale_width, scale_height), resample)
 
     char_sets = [
         '@%#*+=-:. ',  # Standard
@@ -137,25 +192,34 @@ def image_to_ascii_detail(image_path, max_width=80, max_height=24,
     ]
 
     ascii_chars = char_sets[min(charset, len(char_sets) - 1)]
-    pixels = list(img.getdata())
-
-    ascii_art = []
-    for y in range(scale_height):
-        line = ''
-        for x in range(scale_width):
-            pixel = pixels[y * scale_width + x]
-            # Какой-то корректор гаммы, сложнааа
-            gamma_corrected = math.pow(pixel / 255.0, 1.5)
-            char_index = int(gamma_corrected * (len(ascii_chars) - 1))
-            line += ascii_chars[max(0, min(len(ascii_chars) - 1, char_index))]
-        ascii_art.append(line)
+
+    # Map the whole image in one pass, then split it into rows
+    table = _gamma_table(ascii_chars)
+    pixels = img.tobytes()
+    if isinstance(table, bytes):
+        text = pixels.translate(table).decode('ascii')
+    else:
+        # Block characters don't fit in a byte, translate as text instead
+        text = pixels.decode('latin-1').translate(table)
+
+    ascii_art = [text[y * scale_width:(y + 1) * scale_width]
+                 for y in range(scale_height)]
 
     return '\n'.join(ascii_art)
 
 
 def show_histogram_ui(file_path):
     """Displays a UI with the image and its histogram."""
-    if not MATPLOTLIB_AVAILABLE:
+    # GUI dependencies are only imported when the UI is actually shown
+    import tkinter as tk
+    from tkinter import ttk
+    from PIL import ImageTk
+
+    # Try to import matplotlib
+    try:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    except ImportError:
         print(
             "Error: Matplotlib is required for the histogram UI. Please install it using 'pip install matplotlib'")
         sys.exit(1)
@@ -178,7 +242,9 @@ def show_histogram_ui(file_path):
     # --- Image Display ---
     try:
         img = Image.open(file_path)
-        # Resize for display
+        # Resize for display. thumbnail() works in place and lets the JPEG
+        # decoder downscale via draft(), so the histograms below are also
+        # computed on this small copy instead of the full-size image.
         img.thumbnail((600, 600), Image.LANCZOS)
         photo = ImageTk.PhotoImage(img)
         image_label = ttk.Label(right_frame, image=photo)
@@ -190,29 +256,31 @@ def show_histogram_ui(file_path):
         return
 
     # --- Histogram Display ---
-    fig = Figure(figsize=(5, 7), dpi=100)
+    # A multi-band histogram() covers all RGB channels in a single pass
+    luminosity = img if img.mode == 'L' else img.convert('L')
+    hist_overall = luminosity.histogram()
+    hist_channels = img.histogram() if img.mode == 'RGB' else None
+
+    fig = Figure(figsize=(5, 7), dpi=100, constrained_layout=True)
     canvas = FigureCanvasTkAgg(fig, master=left_frame)
     canvas_widget = canvas.get_tk_widget()
     canvas_widget.pack(fill=tk.BOTH, expand=True)
 
     # Overall Histogram
     ax_overall = fig.add_subplot(4, 1, 1)
-    hist_overall = img.convert('L').histogram()
     ax_overall.plot(hist_overall)
     ax_overall.set_title("Overall (Luminosity)")
     ax_overall.grid(True)
 
     # Channel Histograms
-    if img.mode == 'RGB':
+    if hist_channels is not None:
         colors = ('red', 'green', 'blue')
-        channels = img.split()
-        for i, (channel, color) in enumerate(zip(channels, colors)):
+        for i, color in enumerate(colors):
             ax = fig.add_subplot(4, 1, i + 2)
-            ax.plot(channel.histogram(), color=color)
+            ax.plot(hist_channels[i * 256:(i + 1) * 256], color=color)
             ax.set_title(f"{color.capitalize()} Channel")
             ax.grid(True)
 
-    fig.tight_layout()
     canvas.draw()
 
     root.mainloop()
@@ -237,9 +305,15 @@ def main():
     if args.histogram:
         show_histogram_ui(args.file)
     else:
-        # Parse headers
+        # The ASCII renderer needs the whole file anyway, so it is read once
+        # and the headers are parsed from the same bytes
         try:
-            headers = parse_jpeg_headers(args.file)
+            if args.headers_only:
+                headers = parse_jpeg_headers(args.file)
+            else:
+                with open(args.file, 'rb') as f:
+                    data = f.read()
+                headers = _parse_markers(data)
             print_headers(headers)
         except Exception as e:
             print(f"Error parsing headers: {e}")
@@ -248,7 +322,8 @@ def main():
         if not args.headers_only:
             # Display image as ASCII
             try:
-                ascii_art = image_to_ascii_detail(args.file, charset=3)
+                ascii_art = image_to_ascii_detail(io.BytesIO(data),
+                                                  charset=3)
                 print("\nImage (ASCII representation):")
                 print(ascii_art)
             except Exception as e:
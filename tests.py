@@ -4,6 +4,7 @@ import os
 import tempfile
 from PIL import Image
 import struct
+import subprocess
 import sys
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -82,6 +83,12 @@ class TestJPEGParser:
         with pytest.raises(FileNotFoundError):
             parse_jpeg_headers('nonexistent_file.jpg')
 
+    def test_parse_jpeg_headers_bytes_path(self, sample_jpeg):
+        """Тест парсинга по пути, переданному как bytes"""
+        headers = parse_jpeg_headers(os.fsencode(sample_jpeg))
+
+        assert headers == parse_jpeg_headers(sample_jpeg)
+
     def test_print_headers(self, sample_jpeg, capsys):
         """Тест вывода заголовков"""
         headers = parse_jpeg_headers(sample_jpeg)
@@ -182,6 +189,52 @@ class TestJPEGParser:
             assert sof0_info['width'] == 100
             assert sof0_info['height'] == 100
 
+    def test_app0_data_preview(self, sample_jpeg):
+        """Тест что от APP0 хранится только начало данных"""
+        with open(sample_jpeg, 'rb') as f:
+            data = f.read()
+        # Заменяем APP0 от Pillow на сегмент длиннее 50 байт
+        app0_end = 4 + struct.unpack('>H', data[4:6])[0]
+        payload = b'JFIF\x00' + bytes(range(95))
+        segment = b'\xff\xe0' + struct.pack('>H', len(payload) + 2) + payload
+        with open(sample_jpeg, 'wb') as f:
+            f.write(data[:2] + segment + data[app0_end:])
+
+        headers = parse_jpeg_headers(sample_jpeg)
+
+        assert headers['APP0']['data_preview'] == payload[:50]
+        assert 'data' not in headers['APP0']
+        assert headers['SOF0']['width'] == 100
+
+    def test_parsing_stops_at_sos(self, sample_jpeg):
+        """Тест что после SOS сжатые данные не разбираются как маркеры"""
+        with open(sample_jpeg, 'rb') as f:
+            data = f.read()
+        # Сжатые данные начинаются с чего-то похожего на маркер COM
+        pos = 2
+        while data[pos + 1] != 0xDA:
+            pos += 2 + struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        scan = pos + 2 + struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        with open(sample_jpeg, 'wb') as f:
+            f.write(data[:scan] + b'\xff\xfe\x00\x04ab' + data[scan:])
+
+        headers = parse_jpeg_headers(sample_jpeg)
+
+        assert list(headers)[-1] == 'SOS'
+        assert 'Marker 0xFFFE' not in headers
+
+    def test_fill_bytes_before_marker(self, sample_jpeg):
+        """Тест байтов заполнения 0xFF перед маркером"""
+        with open(sample_jpeg, 'rb') as f:
+            data = f.read()
+        with open(sample_jpeg, 'wb') as f:
+            f.write(data[:2] + b'\xff\xff\xff' + data[2:])
+
+        headers = parse_jpeg_headers(sample_jpeg)
+
+        assert 'APP0' in headers
+        assert headers['SOF0']['width'] == 100
+
 
 class TestJPEGParserEdgeCases:
     """Тесты граничных случаев"""
@@ -241,6 +294,45 @@ class TestJPEGParserEdgeCases:
             except:
                 pass
 
+    def test_large_downscale_uses_bilinear(self):
+        """Тест что при уменьшении больше чем в 16 раз используется BILINEAR"""
+        fd, path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        fd, expected_path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        try:
+            img = Image.effect_mandelbrot((2000, 1000), (-2, -1, 1, 1), 100)
+            img.save(path, 'PNG')
+            # Уже уменьшенная картинка того же размера не пересэмплируется
+            img.resize((80, 24), Image.BILINEAR).save(expected_path, 'PNG')
+
+            ascii_result = image_to_ascii_detail(path, max_width=80,
+                                                 max_height=24)
+            expected = image_to_ascii_detail(expected_path, max_width=80,
+                                             max_height=24)
+            assert ascii_result == expected
+        finally:
+            for p in (path, expected_path):
+                try:
+                    os.unlink(p)
+                except:
+                    pass
+
+    def test_zero_target_height(self):
+        """Тест очень широкого изображения с нулевой высотой результата"""
+        fd, path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        try:
+            Image.new('L', (300, 1)).save(path, 'PNG')
+
+            with pytest.raises(ValueError):
+                image_to_ascii_detail(path)
+        finally:
+            try:
+                os.unlink(path)
+            except:
+                pass
+
 
 def test_image_processing_errors():
     """Тест ошибки при другом изображении"""
@@ -261,5 +353,15 @@ def test_image_processing_errors():
             pass
 
 
+def test_import_does_not_load_gui():
+    """Тест что import main не тянет tkinter, ImageTk и matplotlib"""
+    code = ("import sys, main; "
+            "assert 'tkinter' not in sys.modules; "
+            "assert 'PIL.ImageTk' not in sys.modules; "
+            "assert 'matplotlib' not in sys.modules")
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])